@@ -1,8 +1,719 @@
 import os
+import codecs
+import errno
+import heapq
 import json
-from typing import Dict
+import functools
+import mmap
+import stat
+import time
+from typing import (
+    Any,
+    BinaryIO,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 import click
 
+# Files at least this large are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 64 * 1024
+
+# Files at least this large are written out while they are scanned instead of
+# being built up in memory first
+STREAM_THRESHOLD = 16 * 1024 * 1024
+
+# Size of the slices used when streaming or validating large files
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Number of leading bytes checked for a NUL byte to detect binary files
+BINARY_SNIFF_SIZE = 4096
+
+# Dictionaries with at least this many keys are matched with an Aho-Corasick
+# automaton; below it, looking up each key with find is faster
+AUTOMATON_MIN_KEYS = 32
+
+# Number of buffered output lines that triggers a write to stdout
+OUTPUT_FLUSH_LINES = 256
+
+# Seconds after which buffered output is written even if there is little of it
+OUTPUT_FLUSH_INTERVAL = 0.5
+
+Buffer = Union[bytes, mmap.mmap]
+Writer = Callable[[Union[bytes, memoryview]], object]
+Replacer = Callable[[Buffer, Writer], bool]
+# Start, end and key of a match in some content
+Match = Tuple[int, int, bytes]
+Matcher = Callable[[Buffer], Iterator[Match]]
+
+# Replacer used by worker processes, set up by _init_worker
+_worker_replacer: Optional[Replacer] = None
+
+
+def find_matches(content: Buffer, keys: List[bytes]) -> Iterator[Match]:
+    """
+    Find the keys in content by looking each of them up with find.
+
+    Matches are leftmost-longest and do not overlap. The next occurrence of
+    every key is kept in a heap, ordered by position and then by length, and
+    only looked up again once the previous one has been passed.
+
+    Args:
+        content (Buffer): Bytes or memory map to search.
+        keys (List[bytes]): Non-empty keys to look for.
+
+    Yields:
+        Match: Start, end and key of each match, in order.
+    """
+    heads = []
+    for key in keys:
+        start = content.find(key)
+        if start != -1:
+            heads.append((start, -len(key), key))
+    heapq.heapify(heads)
+
+    cursor = 0
+    while heads:
+        start, neg_len, key = heads[0]
+        if start >= cursor:
+            cursor = start - neg_len
+            yield start, cursor, key
+        start = content.find(key, cursor)
+        if start == -1:
+            heapq.heappop(heads)
+        else:
+            heapq.heapreplace(heads, (start, neg_len, key))
+
+
+def automaton_matches(content: Buffer, automaton: Any, max_len: int) -> Iterator[Match]:
+    """
+    Find the keys in content with an Aho-Corasick automaton.
+
+    Matches are leftmost-longest and do not overlap. The automaton reports
+    every occurrence, overlapping ones included, in the order they end; they
+    are held in a heap until no occurrence starting earlier can follow. The
+    content is decoded as Latin-1, which maps each byte to one character,
+    one STREAM_CHUNK_SIZE window at a time so memory use stays bounded.
+
+    Args:
+        content (Buffer): Bytes or memory map to search.
+        automaton (Any): ahocorasick.Automaton built by build_matcher.
+        max_len (int): Length of the longest key.
+
+    Yields:
+        Match: Start, end and key of each match, in order.
+    """
+    cursor = 0
+    pending: List[Tuple[int, int, bytes]] = []
+    for window in range(0, len(content), STREAM_CHUNK_SIZE):
+        # Start early enough to catch keys running into the window
+        offset = max(0, window - max_len + 1)
+        text = content[offset : window + STREAM_CHUNK_SIZE].decode("latin-1")
+        for last, key in automaton.iter(text):
+            end = offset + last + 1
+            if end <= window:
+                # Already found in the previous window
+                continue
+            # Nothing found from here on can start before end - max_len
+            while pending and pending[0][0] < end - max_len:
+                start, neg_len, match_key = heapq.heappop(pending)
+                if start >= cursor:
+                    cursor = start - neg_len
+                    yield start, cursor, match_key
+            start = end - len(key)
+            if start >= cursor:
+                heapq.heappush(pending, (start, -len(key), key))
+
+    while pending:
+        start, neg_len, key = heapq.heappop(pending)
+        if start >= cursor:
+            cursor = start - neg_len
+            yield start, cursor, key
+
+
+def build_matcher(keys: List[bytes]) -> Matcher:
+    """
+    Build the function finding the keys in content.
+
+    Dictionaries of at least AUTOMATON_MIN_KEYS keys are matched with an
+    Aho-Corasick automaton, which scans the content once whatever the number
+    of keys. Smaller ones are faster to look up one key at a time, and are
+    also used when pyahocorasick is not installed.
+
+    Args:
+        keys (List[bytes]): Non-empty keys to look for.
+
+    Returns:
+        Matcher: Function yielding the matches found in content.
+    """
+    if len(keys) >= AUTOMATON_MIN_KEYS:
+        try:
+            # Imported here as small dictionaries do not need it
+            import ahocorasick
+        except ImportError:
+            pass
+        else:
+            automaton = ahocorasick.Automaton()
+            for key in keys:
+                automaton.add_word(key.decode("latin-1"), key)
+            automaton.make_automaton()
+            max_len = max(map(len, keys))
+            return lambda content: automaton_matches(content, automaton, max_len)
+
+    return lambda content: find_matches(content, keys)
+
+
+def replace_content(
+    content: Buffer,
+    matches: Iterable[Match],
+    replacement_dict: Dict[bytes, bytes],
+    write: Writer,
+) -> bool:
+    """
+    Replace every match in the content in a single pass.
+
+    The output is handed to write piece by piece, so it never has to be held
+    in memory as a whole.
+
+    Args:
+        content (Buffer): Bytes or memory map to process.
+        matches (Iterable[Match]): Matches found in the content, in order.
+        replacement_dict (Dict[bytes, bytes]): Mapping of text to replace.
+        write (Writer): Called with each piece of the new content.
+
+    Returns:
+        bool: True if the new content differs from the original.
+    """
+    last_end = 0
+    changed = False
+    # Slicing a view hands the gaps between matches to write without copying
+    # them; released on exit so a memory map can still be closed
+    with memoryview(content) as view:
+        for start, end, key in matches:
+            value = replacement_dict[key]
+            changed = changed or value != key
+            write(view[last_end:start])
+            write(value)
+            last_end = end
+        if changed:
+            write(view[last_end:])
+    return changed
+
+
+def build_replacer(replacement_dict: Dict[str, str]) -> Replacer:
+    """
+    Build the replacement function for a dictionary.
+
+    The dictionary is encoded and its matcher built once so that the same
+    replacer can be applied to every file without repeating that work.
+    Content without any key is rejected by the first find of each key, or
+    by the single automaton scan for large dictionaries, without writing
+    anything.
+
+    Args:
+        replacement_dict (Dict[str, str]): Mapping of text to replace.
+
+    Returns:
+        Replacer: Function writing the replaced content and returning whether
+        anything changed.
+    """
+    byte_dict = {
+        key.encode("utf-8"): value.encode("utf-8")
+        for key, value in replacement_dict.items()
+    }
+    matcher = build_matcher([key for key in byte_dict if key])
+
+    def replacer(content: Buffer, write: Writer) -> bool:
+        return replace_content(content, matcher(content), byte_dict, write)
+
+    return replacer
+
+
+def check_utf8(content: Buffer) -> None:
+    """
+    Check that content is valid UTF-8 without decoding it all at once.
+
+    Args:
+        content (Buffer): Bytes or memory map to check.
+
+    Raises:
+        UnicodeDecodeError: If the content is not valid UTF-8.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    for start in range(0, len(content), STREAM_CHUNK_SIZE):
+        decoder.decode(content[start : start + STREAM_CHUNK_SIZE])
+    decoder.decode(b"", final=True)
+
+
+class StagedFile(NamedTuple):
+    """
+    New content for a file, waiting in a temporary file to be moved into place.
+
+    Attributes:
+        tmp_path (str): Path to the temporary file holding the new content.
+        file_path (str): Resolved path to the file to update.
+        replace (bool): Whether the file can be replaced by renaming tmp_path
+            over it, rather than having the new content copied into it.
+    """
+
+    tmp_path: str
+    file_path: str
+    replace: bool
+
+
+class IncompleteWriteError(Exception):
+    """
+    Raised when a file updated in place could not be written in full.
+
+    The file may be truncated at that point, so the temporary file holding
+    its new content is kept for it to be recovered from.
+
+    Attributes:
+        tmp_path (str): Path to the temporary file holding the new content.
+    """
+
+    def __init__(self, file_path: str, tmp_path: str):
+        super().__init__(f"Could not write {file_path}, new content is in {tmp_path}")
+        self.tmp_path = tmp_path
+
+
+def create_temp_file(file_path: str, st: os.stat_result) -> Tuple[int, StagedFile]:
+    """
+    Create the temporary file that receives the new content of file_path.
+
+    Symbolic links are resolved so that the file they point at is updated. The
+    temporary file is created next to that file, so it can be renamed over it
+    and never fills up a memory-backed system temporary directory; the system
+    temporary directory is only used when the file's directory is read-only.
+
+    Args:
+        file_path (str): Path to the file the content is meant for.
+        st (os.stat_result): Status of the file, as read when it was opened.
+
+    Returns:
+        Tuple[int, StagedFile]: Descriptor of the temporary file, opened for
+        writing, and where the content goes.
+    """
+    # Imported here so runs that change nothing never load it
+    import tempfile
+
+    real_path = os.path.realpath(file_path)
+    directory = os.path.dirname(real_path)
+    writable = os.access(directory, os.W_OK)
+    fd, tmp_path = tempfile.mkstemp(dir=directory if writable else None)
+    # Replacing a file that has other names would split its hard links
+    return fd, StagedFile(tmp_path, real_path, writable and st.st_nlink == 1)
+
+
+def write_temp_file(
+    file_path: str, st: os.stat_result, write_content: Callable[[Writer], bool]
+) -> Optional[StagedFile]:
+    """
+    Write new content for file_path to a temporary file.
+
+    The temporary file is only created on the first write, so content that
+    turns out to be unchanged costs no path resolution or file creation.
+
+    Args:
+        file_path (str): Path to the file the content is meant for.
+        st (os.stat_result): Status of the file, as read when it was opened.
+        write_content (Callable[[Writer], bool]): Writes the content through
+            the given writer and returns whether it should be kept.
+
+    Returns:
+        Optional[StagedFile]: The temporary file, or None if write_content
+        decided the content should not be kept.
+    """
+    staged: Optional[StagedFile] = None
+    tmp_file: Optional[BinaryIO] = None
+
+    def write(data: Union[bytes, memoryview]) -> None:
+        nonlocal staged, tmp_file
+        if tmp_file is None:
+            fd, staged = create_temp_file(file_path, st)
+            tmp_file = os.fdopen(fd, "wb", buffering=STREAM_CHUNK_SIZE)
+        tmp_file.write(data)
+
+    try:
+        keep = write_content(write)
+        if tmp_file is not None:
+            with tmp_file:
+                if keep and staged.replace:
+                    # Make sure the data is on disk before it replaces the original
+                    tmp_file.flush()
+                    os.fsync(tmp_file.fileno())
+    except BaseException:
+        if staged is not None:
+            tmp_file.close()
+            os.unlink(staged.tmp_path)
+        raise
+
+    if not keep:
+        if staged is not None:
+            os.unlink(staged.tmp_path)
+        return None
+    return staged
+
+
+def copy_metadata(tmp_path: str, file_path: str, st: os.stat_result) -> None:
+    """
+    Give tmp_path the owner, permissions and extended attributes of file_path.
+
+    Args:
+        tmp_path (str): Path to the temporary file holding the new content.
+        file_path (str): Resolved path to the file to update.
+        st (os.stat_result): Status of the file, as read when it was opened.
+
+    Raises:
+        OSError: If any of them cannot be copied, for example the owner of
+        another user's file when not running as root.
+    """
+    if hasattr(os, "chown"):
+        tmp_st = os.stat(tmp_path)
+        if (tmp_st.st_uid, tmp_st.st_gid) != (st.st_uid, st.st_gid):
+            os.chown(tmp_path, st.st_uid, st.st_gid)
+    # Set after the owner, as changing it can clear the setuid and setgid bits
+    os.chmod(tmp_path, stat.S_IMODE(st.st_mode))
+    if hasattr(os, "listxattr"):
+        try:
+            names = os.listxattr(file_path)
+        except OSError as e:
+            if e.errno != errno.ENOTSUP:
+                raise
+            names = []
+        for name in names:
+            # The system labels new files itself
+            if name != "security.selinux":
+                os.setxattr(tmp_path, name, os.getxattr(file_path, name))
+
+
+def move_into_place(staged: StagedFile, st: os.stat_result) -> None:
+    """
+    Put the new content of a file in place and remove the temporary file.
+
+    Where possible, the temporary file gets the file's owner, permissions and
+    extended attributes and is renamed over it, so an interrupted run never
+    leaves a truncated file behind. Otherwise, for files with several hard
+    links, in read-only directories or whose owner cannot be kept, the content
+    is copied into the existing file.
+
+    Args:
+        staged (StagedFile): The temporary file and where its content goes.
+        st (os.stat_result): Status of the file, as read when it was opened.
+
+    Raises:
+        IncompleteWriteError: If copying the content into the file failed
+        after it was truncated; the temporary file is kept.
+    """
+    tmp_path, file_path, replace = staged
+    if replace:
+        try:
+            copy_metadata(tmp_path, file_path, st)
+        except OSError:
+            # Keep what the file had by copying the content into it instead
+            pass
+        else:
+            try:
+                os.replace(tmp_path, file_path)
+            except BaseException:
+                os.unlink(tmp_path)
+                raise
+            return
+
+    try:
+        dst = open(file_path, "wb")
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+    # Imported here as only in-place updates need it
+    import shutil
+
+    # Once the file is truncated, the temporary file holds the only complete
+    # copy of the new content and must not be removed until it is copied
+    try:
+        with dst, open(tmp_path, "rb") as src:
+            shutil.copyfileobj(src, dst, STREAM_CHUNK_SIZE)
+            dst.flush()
+            os.fsync(dst.fileno())
+    except Exception as e:
+        raise IncompleteWriteError(file_path, tmp_path) from e
+    os.unlink(tmp_path)
+
+
+def _replace_in_memory(
+    file_path: str, st: os.stat_result, content: Buffer, replacer: Replacer
+) -> Optional[StagedFile]:
+    """
+    Build the new content in memory and write it only if it changed.
+
+    Args:
+        file_path (str): Path to the file being processed.
+        st (os.stat_result): Status of the file, as read when it was opened.
+        content (Buffer): Current content of the file.
+        replacer (Replacer): Function built by build_replacer.
+
+    Returns:
+        Optional[StagedFile]: The temporary file with the new content, or None
+        if the file is unchanged.
+    """
+    parts: List[Union[bytes, memoryview]] = []
+    if not replacer(content, parts.append):
+        return None
+    check_utf8(content)
+    new_content = b"".join(parts)
+
+    def write_content(write: Writer) -> bool:
+        write(new_content)
+        return True
+
+    return write_temp_file(file_path, st, write_content)
+
+
+def _replace_streaming(
+    file_path: str, st: os.stat_result, content: Buffer, replacer: Replacer
+) -> Optional[StagedFile]:
+    """
+    Write the new content out while scanning, dropping it if unchanged.
+
+    Args:
+        file_path (str): Path to the file being processed.
+        st (os.stat_result): Status of the file, as read when it was opened.
+        content (Buffer): Current content of the file.
+        replacer (Replacer): Function built by build_replacer.
+
+    Returns:
+        Optional[StagedFile]: The temporary file with the new content, or None
+        if the file is unchanged.
+    """
+
+    def write_content(write: Writer) -> bool:
+        if not replacer(content, write):
+            return False
+        check_utf8(content)
+        return True
+
+    return write_temp_file(file_path, st, write_content)
+
+
+def is_binary(content: Buffer) -> bool:
+    """
+    Guess whether content is binary by looking for a NUL byte near the start.
+
+    Args:
+        content (Buffer): Bytes or memory map to check.
+
+    Returns:
+        bool: True if the content looks binary.
+    """
+    return content.find(b"\x00", 0, BINARY_SNIFF_SIZE) != -1
+
+
+def process_file(file_path: str, replacer: Replacer) -> Optional[bool]:
+    """
+    Apply the replacements to a single file in place.
+
+    Small files are read directly; larger ones are memory-mapped so they are
+    scanned without an intermediate copy. The new content of very large files
+    is streamed to disk during the scan, keeping memory use bounded. Binary
+    files are left untouched.
+
+    Args:
+        file_path (str): Path to the file to process.
+        replacer (Replacer): Function built by build_replacer.
+
+    Returns:
+        Optional[bool]: True if the file was modified, False if it was left
+        unchanged, or None if it was skipped as binary.
+
+    Raises:
+        UnicodeDecodeError: If a file that would be modified is not valid UTF-8.
+        IncompleteWriteError: If the file could only be partly rewritten.
+    """
+    with open(file_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size < MMAP_THRESHOLD:
+            content = f.read()
+            if is_binary(content):
+                return None
+            staged = _replace_in_memory(file_path, st, content, replacer)
+        else:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                if is_binary(mm):
+                    return None
+                if hasattr(mm, "madvise"):
+                    mm.madvise(mmap.MADV_SEQUENTIAL)
+                if st.st_size < STREAM_THRESHOLD:
+                    staged = _replace_in_memory(file_path, st, mm, replacer)
+                else:
+                    staged = _replace_streaming(file_path, st, mm, replacer)
+
+    if staged is None:
+        return False
+
+    move_into_place(staged, st)
+    return True
+
+
+@functools.lru_cache(maxsize=8)
+def _parse_config(raw_config: bytes) -> Dict[str, Any]:
+    """
+    Parse the raw contents of a configuration file.
+
+    Results are cached by content, so loading an unchanged file again skips
+    JSON parsing. The returned dictionary is shared and must not be modified.
+
+    Args:
+        raw_config (bytes): Contents of the configuration file.
+
+    Returns:
+        Dict[str, Any]: The parsed configuration.
+    """
+    return json.loads(raw_config)
+
+
+def load_config(config_path: str = "config.json") -> Dict[str, Any]:
+    """
+    Load the dictionaries and configuration options from a config file.
+
+    Args:
+        config_path (str): Path to the configuration file.
+
+    Returns:
+        Dict[str, Any]: The parsed configuration.
+    """
+    with open(config_path, "rb") as config_file:
+        return _parse_config(config_file.read())
+
+
+def walk_files(folder: str, ignore_directories: Set[str]) -> Iterator[os.DirEntry]:
+    """
+    Yield every file below folder, skipping ignored directories.
+
+    Uses os.scandir directly so that names and file types come from the
+    directory listing without building extra path objects or stat calls.
+    Like os.walk, symbolic links to directories are not followed and
+    unreadable directories are skipped.
+
+    Args:
+        folder (str): Path to the folder to walk.
+        ignore_directories (Set[str]): Directory names to skip.
+
+    Yields:
+        os.DirEntry: Entry for each file found.
+    """
+    stack = [folder]
+    while stack:
+        try:
+            # Materialize the listing so files replaced while processing
+            # this directory do not show up in the iteration
+            with os.scandir(stack.pop()) as it:
+                entries = list(it)
+        except OSError:
+            continue
+
+        subdirs = []
+        for entry in entries:
+            if entry.is_dir():
+                if not entry.is_symlink() and entry.name not in ignore_directories:
+                    subdirs.append(entry.path)
+            else:
+                yield entry
+
+        # Push in reverse so directories are visited in listing order
+        stack.extend(reversed(subdirs))
+
+
+def _init_worker(replacement_dict: Dict[str, str]) -> None:
+    """
+    Build the replacer once per worker process.
+
+    Matchers are rebuilt in each worker rather than pickled with
+    every task.
+
+    Args:
+        replacement_dict (Dict[str, str]): Mapping of text to replace.
+    """
+    global _worker_replacer
+    _worker_replacer = build_replacer(replacement_dict)
+
+
+def _process_file_worker(file_path: str) -> Tuple[str, Optional[str]]:
+    """
+    Process a file with the worker's replacer.
+
+    Args:
+        file_path (str): Path to the file to process.
+
+    Returns:
+        Tuple[str, Optional[str]]: "processed" if the file was processed,
+        "binary" if it was skipped as binary, or "error" if processing failed,
+        along with the path to the temporary file holding the new content if
+        the file could only be partly rewritten.
+    """
+    try:
+        result = process_file(file_path, _worker_replacer)
+    except IncompleteWriteError as e:
+        return "error", e.tmp_path
+    except Exception:
+        return "error", None
+    return ("binary" if result is None else "processed"), None
+
+
+def process_files(
+    file_paths: List[str], replacement_dict: Dict[str, str], jobs: Optional[int]
+) -> Iterator[Tuple[str, Optional[str]]]:
+    """
+    Process files, in parallel when more than one job is allowed.
+
+    Outcomes are yielded as soon as they are available, so progress can be
+    reported while later files are still being processed.
+
+    Args:
+        file_paths (List[str]): Paths of the files to process.
+        replacement_dict (Dict[str, str]): Mapping of text to replace.
+        jobs (Optional[int]): Number of worker processes, or None for one per CPU.
+
+    Yields:
+        Tuple[str, Optional[str]]: Outcome of each file as returned by
+        _process_file_worker, in the same order as file_paths.
+    """
+    workers = min(jobs or os.cpu_count() or 1, len(file_paths))
+    if workers <= 1:
+        _init_worker(replacement_dict)
+        yield from map(_process_file_worker, file_paths)
+        return
+
+    # Imported here as it pulls in multiprocessing, which sequential runs
+    # do not need
+    from concurrent.futures import ProcessPoolExecutor
+
+    # Hand out files in batches to amortize the cost of talking to workers
+    chunksize = max(1, min(64, len(file_paths) // (workers * 4)))
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(replacement_dict,)
+    ) as executor:
+        yield from executor.map(_process_file_worker, file_paths, chunksize=chunksize)
+
+
+def flush_output(output: List[str]) -> None:
+    """
+    Print buffered output lines with a single write and clear the buffer.
+
+    Args:
+        output (List[str]): Buffered output lines.
+    """
+    if output:
+        print("\n".join(output))
+        output.clear()
+
 
 @click.command(name="replace_text")
 @click.option(
@@ -19,7 +730,15 @@ import click
     default=None,
     help="Name of the dictionary to use from config.json.",
 )
-def replace_text(direction: int, folder: str, dict_name: str) -> None:
+@click.option(
+    "--jobs",
+    type=click.IntRange(min=1),
+    default=None,
+    help="Number of worker processes to use (defaults to the number of CPUs).",
+)
+def replace_text(
+    direction: int, folder: str, dict_name: str, jobs: Optional[int]
+) -> None:
     """
     Replace text in files based on the given dictionary and direction.
 
@@ -27,16 +746,16 @@ def replace_text(direction: int, folder: str, dict_name: str) -> None:
         direction (int): Direction for replacement (1 for keys-to-values, 2 for values-to-keys).
         folder (str): Path to the folder containing text files.
         dict_name (str): Name of the dictionary to use from config.json.
+        jobs (Optional[int]): Number of worker processes to use.
     """
     # Load dictionaries and configuration from config file
-    with open("config.json", "r") as config_file:
-        config = json.load(config_file)
+    config = load_config()
 
     # Retrieve the dictionaries and configuration options
     dictionaries = config.get("dictionaries", {})
-    ignore_extensions = config.get("ignore_extensions", [])
-    ignore_directories = config.get("ignore_directories", [])
-    ignore_file_prefixes = config.get("ignore_file_prefixes", [])
+    ignore_extensions = tuple(config.get("ignore_extensions", []))
+    ignore_directories = set(config.get("ignore_directories", []))
+    ignore_file_prefixes = tuple(config.get("ignore_file_prefixes", []))
 
     if not dictionaries:
         print("No dictionaries found in config.json")
@@ -60,38 +779,60 @@ def replace_text(direction: int, folder: str, dict_name: str) -> None:
     if direction == 2:
         replacement_dict = {v: k for k, v in replacement_dict.items()}
 
-    # Process each file in the folder
-    for root, dirs, files in os.walk(folder):
-        # Remove ignored directories from the dirs list
-        dirs[:] = [d for d in dirs if d not in ignore_directories]
-
-        for file in files:
-            file_path = os.path.join(root, file)
+    # Collect the files in the folder, along with the reason a file is
+    # skipped, so they can be reported in order once processing starts
+    files: List[Tuple[os.DirEntry, Optional[str]]] = []
+    for entry in walk_files(folder, ignore_directories):
+        file = entry.name
 
-            # Skip files with ignored extensions
-            if any(file.endswith(ext) for ext in ignore_extensions):
-                print(f"Skipped file (ignored extension): {file_path}")
-                continue
-
-            # Skip files with ignored prefixes
-            if any(file.startswith(prefix) for prefix in ignore_file_prefixes):
-                print(f"Skipped file (ignored prefix): {file_path}")
-                continue
-
-            print(f"Processing file: {file}")
-            try:
-                with open(file_path, "r", encoding="utf-8") as f:
-                    content = f.read()
-                for key, value in replacement_dict.items():
-                    content = content.replace(key, value)
+        # Skip files with ignored extensions
+        if file.endswith(ignore_extensions):
+            files.append((entry, "ignored extension"))
+        # Skip files with ignored prefixes
+        elif file.startswith(ignore_file_prefixes):
+            files.append((entry, "ignored prefix"))
+        else:
+            files.append((entry, None))
 
-                with open(file_path, "w", encoding="utf-8") as f:
-                    f.write(content)
+    # Process the files, compiling the dictionary once per worker, and buffer
+    # the output so large trees do not issue a write per file
+    outcomes = process_files(
+        [entry.path for entry, skipped in files if skipped is None],
+        replacement_dict,
+        jobs,
+    )
+    output: List[str] = []
+    last_flush = time.monotonic()
+    try:
+        for entry, skipped in files:
+            if skipped is not None:
+                output.append(f"Skipped file ({skipped}): {entry.path}")
+            else:
+                output.append(f"Processing file: {entry.name}")
+                outcome, tmp_path = next(outcomes)
+                if outcome == "processed":
+                    output.append(f"Processed file: {entry.path}")
+                elif outcome == "binary":
+                    output.append(f"Skipped file (binary): {entry.path}")
+                elif tmp_path is not None:
+                    output.append(
+                        f"Error processing file: {entry.name}, "
+                        f"new content kept in {tmp_path}, continuing.."
+                    )
+                else:
+                    output.append(f"Error processing file: {entry.name}, continuing..")
 
-                print(f"Processed file: {file_path}")
-            except Exception as e:
-                print(f"Error processing file: {file}, continuing..")
-                continue
+            # Write in batches, but often enough to show progress
+            now = time.monotonic()
+            if (
+                len(output) >= OUTPUT_FLUSH_LINES
+                or now - last_flush >= OUTPUT_FLUSH_INTERVAL
+            ):
+                flush_output(output)
+                last_flush = now
+    finally:
+        # Report what was done even if processing was interrupted
+        flush_output(output)
 
 
 if __name__ == "__main__":
@@ -1,54 +1,87 @@
-import unittest, json, os
+import unittest, errno, json, os, re, tempfile, functools
+from pathlib import Path
+from unittest import mock
 from click.testing import CliRunner
-from replace_text.replace_text import replace_text
+from replace_text.replace_text import replace_text, walk_files
+
+_RUNNER = CliRunner()
+
+
+# Options shared by every test config; only the dictionaries vary
+_BASE_CONFIG = {
+    "dictionaries": None,
+    "ignore_extensions": [".ignore"],
+    "ignore_directories": ["ignore_dir"],
+    "ignore_file_prefixes": ["ignore_"],
+}
+
+
+@functools.lru_cache(maxsize=32)
+def _config_bytes(dictionaries):
+    """
+    Serialize a test config, caching the result by content.
+
+    Args:
+        dictionaries: Tuple of (name, ((key, value), ...)) pairs.
+    """
+    config = _BASE_CONFIG | {
+        "dictionaries": {name: dict(items) for name, items in dictionaries}
+    }
+    return json.dumps(config).encode()
+
+
+def _args(direction, folder, *, dict_name=None, jobs=None):
+    """Build the CLI arguments for an invocation of replace_text."""
+    args = ("--direction", str(direction), "--folder", folder)
+    if dict_name is not None:
+        args += ("--dict-name", dict_name)
+    if jobs is not None:
+        args += ("--jobs", str(jobs))
+    return args
+
+
+_TEST_DICTIONARIES = (
+    ("test_dict", (("Hello", "Bonjour"), ("world", "monde"), ("Python", "Java"))),
+)
 
 
 class TestReplaceText(unittest.TestCase):
+    # Fixture file contents shared by every test
+    TEST_FILES = {
+        "test1.txt": b"Hello world",
+        "test2.txt": b"Python is awesome",
+    }
+
     def setUp(self):
-        self.runner = CliRunner()
+        self.runner = _RUNNER
+
+        # Work in a throwaway directory, in memory-backed /dev/shm when
+        # available; cleanups run last-in first-out, so the CWD is restored
+        # before the directory is removed
+        tmp = tempfile.TemporaryDirectory(
+            dir="/dev/shm" if os.path.isdir("/dev/shm") else None
+        )
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(os.chdir, os.getcwd())
+        os.chdir(tmp.name)
+
+        # Plain names are enough as every test, including those run in
+        # parallel by pytest-xdist, gets its own temporary directory; the
+        # config must be called config.json as the CLI reads it from the CWD
         self.test_folder = "test_folder"
         self.config_file = "config.json"
 
         # Create test folder and files
-        os.makedirs(self.test_folder, exist_ok=True)
-        with open(os.path.join(self.test_folder, "test1.txt"), "w") as f:
-            f.write("Hello world")
-        with open(os.path.join(self.test_folder, "test2.txt"), "w") as f:
-            f.write("Python is awesome")
+        os.mkdir(self.test_folder)
+        for name, content in self.TEST_FILES.items():
+            Path(self.test_folder, name).write_bytes(content)
 
         # Create config file
-        config = {
-            "dictionaries": {
-                "test_dict": {"Hello": "Bonjour", "world": "monde", "Python": "Java"}
-            },
-            "ignore_extensions": [".ignore"],
-            "ignore_directories": ["ignore_dir"],
-            "ignore_file_prefixes": ["ignore_"],
-        }
-        with open(self.config_file, "w") as f:
-            json.dump(config, f)
-
-    def tearDown(self):
-        # Clean up test files and folders
-        for root, dirs, files in os.walk(self.test_folder, topdown=False):
-            for name in files:
-                os.remove(os.path.join(root, name))
-            for name in dirs:
-                os.rmdir(os.path.join(root, name))
-        os.rmdir(self.test_folder)
-        os.remove(self.config_file)
+        Path(self.config_file).write_bytes(_config_bytes(_TEST_DICTIONARIES))
 
     def test_replace_text_keys_to_values(self):
         result = self.runner.invoke(
-            replace_text,
-            [
-                "--direction",
-                "1",
-                "--folder",
-                self.test_folder,
-                "--dict-name",
-                "test_dict",
-            ],
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
         )
         self.assertEqual(result.exit_code, 0)
 
@@ -60,31 +93,73 @@ class TestReplaceText(unittest.TestCase):
             content = f.read()
         self.assertEqual(content, "Java is awesome")
 
-    def test_replace_text_values_to_keys(self):
-        # First, replace keys with values
-        self.runner.invoke(
-            replace_text,
-            [
-                "--direction",
-                "1",
-                "--folder",
-                self.test_folder,
-                "--dict-name",
-                "test_dict",
-            ],
+    def test_replace_text_single_job(self):
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict", jobs=1)
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        with open(os.path.join(self.test_folder, "test1.txt"), "r") as f:
+            content = f.read()
+        self.assertEqual(content, "Bonjour monde")
+
+        with open(os.path.join(self.test_folder, "test2.txt"), "r") as f:
+            content = f.read()
+        self.assertEqual(content, "Java is awesome")
+
+    def test_replace_text_parallel(self):
+        # More files than workers, with skipped ones in between
+        for i in range(1, 7):
+            if i > 2:
+                Path(self.test_folder, f"test{i}.txt").write_bytes(b"Hello world")
+            Path(self.test_folder, f"test{i}.ignore").write_bytes(b"Hello world")
+
+        # Files should be reported in the order they are found, as when run
+        # sequentially; listed up front as replacing files can reorder them
+        expected_lines = []
+        for entry in walk_files(self.test_folder, set()):
+            if entry.name.endswith(".ignore"):
+                expected_lines.append(f"Skipped file (ignored extension): {entry.path}")
+            else:
+                expected_lines.append(f"Processing file: {entry.name}")
+                expected_lines.append(f"Processed file: {entry.path}")
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict", jobs=2)
         )
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(result.output.splitlines(), expected_lines)
+
+        for i in range(1, 7):
+            content = Path(self.test_folder, f"test{i}.txt").read_text()
+            expected = "Java is awesome" if i == 2 else "Bonjour monde"
+            self.assertEqual(content, expected)
+            content = Path(self.test_folder, f"test{i}.ignore").read_text()
+            self.assertEqual(content, "Hello world")
+
+    def test_output_flushed_when_interrupted(self):
+        def process_files(file_paths, replacement_dict, jobs):
+            yield "processed", None
+            raise RuntimeError("worker died")
+
+        # Only the final flush can write the buffered lines
+        with mock.patch(
+            "replace_text.replace_text.process_files", process_files
+        ), mock.patch("replace_text.replace_text.OUTPUT_FLUSH_INTERVAL", float("inf")):
+            result = self.runner.invoke(
+                replace_text, _args(1, self.test_folder, dict_name="test_dict")
+            )
+        self.assertIsInstance(result.exception, RuntimeError)
+        self.assertEqual(result.output.count("Processed file: "), 1)
+
+    def test_replace_text_values_to_keys(self):
+        # Start from already translated files
+        Path(self.test_folder, "test1.txt").write_bytes(b"Bonjour monde")
+        Path(self.test_folder, "test2.txt").write_bytes(b"Java is awesome")
 
         # Then, test replacing values with keys
         result = self.runner.invoke(
-            replace_text,
-            [
-                "--direction",
-                "2",
-                "--folder",
-                self.test_folder,
-                "--dict-name",
-                "test_dict",
-            ],
+            replace_text, _args(2, self.test_folder, dict_name="test_dict")
         )
         self.assertEqual(result.exit_code, 0)
 
@@ -96,69 +171,257 @@ class TestReplaceText(unittest.TestCase):
             content = f.read()
         self.assertEqual(content, "Python is awesome")
 
-    def test_ignore_extensions(self):
-        with open(os.path.join(self.test_folder, "test.ignore"), "w") as f:
-            f.write("Hello world")
+    def test_ignored_paths(self):
+        # One file per ignore rule: extension, directory and prefix
+        cases = [
+            ("test.ignore",),
+            ("ignore_dir", "test.txt"),
+            ("ignore_test.txt",),
+        ]
+        for parts in cases:
+            path = Path(self.test_folder, *parts)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(b"Hello world")
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        for parts in cases:
+            with self.subTest(path=os.path.join(*parts)):
+                # Content should remain unchanged
+                content = Path(self.test_folder, *parts).read_text()
+                self.assertEqual(content, "Hello world")
+
+    def test_binary_file_skipped(self):
+        Path(self.test_folder, "test.bin").write_bytes(b"Hello\x00world")
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Skipped file (binary)", result.output)
+
+        with open(os.path.join(self.test_folder, "test.bin"), "rb") as f:
+            content = f.read()
+        self.assertEqual(content, b"Hello\x00world")  # Content should remain unchanged
+
+    def test_non_utf8_file(self):
+        # Only files that would change are decoded
+        Path(self.test_folder, "match.txt").write_bytes(b"Hello \xff")
+        Path(self.test_folder, "no_match.txt").write_bytes(b"zzz\xff")
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+        self.assertIn("Error processing file: match.txt", result.output)
+        self.assertIn(
+            f"Processed file: {os.path.join(self.test_folder, 'no_match.txt')}",
+            result.output,
+        )
+
+        # Content should remain unchanged
+        for name, content in (
+            ("match.txt", b"Hello \xff"),
+            ("no_match.txt", b"zzz\xff"),
+        ):
+            self.assertEqual(Path(self.test_folder, name).read_bytes(), content)
+
+    def test_nested_directories(self):
+        os.makedirs(os.path.join(self.test_folder, "sub", "deeper"), exist_ok=True)
+        Path(self.test_folder, "sub", "deeper", "test.txt").write_bytes(b"Hello world")
 
         result = self.runner.invoke(
-            replace_text,
-            [
-                "--direction",
-                "1",
-                "--folder",
-                self.test_folder,
-                "--dict-name",
-                "test_dict",
-            ],
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
         )
         self.assertEqual(result.exit_code, 0)
 
-        with open(os.path.join(self.test_folder, "test.ignore"), "r") as f:
+        with open(
+            os.path.join(self.test_folder, "sub", "deeper", "test.txt"), "r"
+        ) as f:
             content = f.read()
-        self.assertEqual(content, "Hello world")  # Content should remain unchanged
+        self.assertEqual(content, "Bonjour monde")
+
+    def test_symlinked_file(self):
+        # The link points outside the folder, like f/link.txt -> ../target.txt
+        Path("target.txt").write_bytes(b"Hello world")
+        os.symlink(os.path.join("..", "target.txt"), Path(self.test_folder, "link.txt"))
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        # The link is kept and the file it points at is updated
+        self.assertTrue(os.path.islink(os.path.join(self.test_folder, "link.txt")))
+        self.assertEqual(Path("target.txt").read_text(), "Bonjour monde")
+
+    def test_hard_linked_file(self):
+        os.link(Path(self.test_folder, "test1.txt"), "other_name.txt")
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        # Both names still refer to the same, updated file
+        self.assertEqual(Path("other_name.txt").read_text(), "Bonjour monde")
+        self.assertTrue(
+            os.path.samefile(Path(self.test_folder, "test1.txt"), "other_name.txt")
+        )
+
+    def test_unwritable_directory(self):
+        file_path = os.path.join(self.test_folder, "test1.txt")
+        inode = os.stat(file_path).st_ino
+
+        # Pretend the folder is read-only, which also holds when running as root
+        with mock.patch("os.access", return_value=False):
+            result = self.runner.invoke(
+                replace_text, _args(1, self.test_folder, dict_name="test_dict", jobs=1)
+            )
+        self.assertEqual(result.exit_code, 0)
+
+        # The file is updated in place rather than replaced
+        self.assertEqual(Path(file_path).read_text(), "Bonjour monde")
+        self.assertEqual(os.stat(file_path).st_ino, inode)
+
+    def test_failed_in_place_write_keeps_content(self):
+        # Fail the copy into the file, once it has been truncated
+        with mock.patch("os.access", return_value=False), mock.patch(
+            "shutil.copyfileobj", side_effect=OSError(errno.ENOSPC, "No space")
+        ):
+            result = self.runner.invoke(
+                replace_text, _args(1, self.test_folder, dict_name="test_dict", jobs=1)
+            )
+        self.assertEqual(result.exit_code, 0)
+
+        # The new content of each file is kept, and where is reported
+        kept = dict(
+            re.findall(
+                r"Error processing file: (.+), new content kept in (.+),", result.output
+            )
+        )
+        for tmp_path in kept.values():
+            self.addCleanup(os.unlink, tmp_path)
+        self.assertEqual(kept.keys(), self.TEST_FILES.keys())
+        self.assertEqual(Path(kept["test1.txt"]).read_text(), "Bonjour monde")
+        self.assertEqual(Path(kept["test2.txt"]).read_text(), "Java is awesome")
+
+    @unittest.skipUnless(
+        hasattr(os, "geteuid") and os.geteuid() == 0, "changing owners needs root"
+    )
+    def test_owner_kept(self):
+        file_path = os.path.join(self.test_folder, "test1.txt")
+        os.chown(file_path, 65534, 65534)
+        inode = os.stat(file_path).st_ino
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        # The file is still replaced as a whole, with the same owner
+        st = os.stat(file_path)
+        self.assertEqual((st.st_uid, st.st_gid), (65534, 65534))
+        self.assertNotEqual(st.st_ino, inode)
+        self.assertEqual(Path(file_path).read_text(), "Bonjour monde")
+
+    def test_extended_attributes_kept(self):
+        file_path = os.path.join(self.test_folder, "test1.txt")
+        try:
+            os.setxattr(file_path, "user.test", b"value")
+        except (AttributeError, OSError):
+            self.skipTest("extended attributes are not supported")
+
+        result = self.runner.invoke(
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
+        )
+        self.assertEqual(result.exit_code, 0)
+
+        self.assertEqual(os.getxattr(file_path, "user.test"), b"value")
+        self.assertEqual(Path(file_path).read_text(), "Bonjour monde")
 
-    def test_ignore_directories(self):
-        os.makedirs(os.path.join(self.test_folder, "ignore_dir"), exist_ok=True)
-        with open(os.path.join(self.test_folder, "ignore_dir", "test.txt"), "w") as f:
-            f.write("Hello world")
+    def test_longest_key_wins(self):
+        Path(self.config_file).write_bytes(
+            _config_bytes((("overlap_dict", (("foo", "1"), ("foobar", "2"))),))
+        )
+        Path(self.test_folder, "test1.txt").write_bytes(b"foobar foo")
 
         result = self.runner.invoke(
-            replace_text,
-            [
-                "--direction",
-                "1",
-                "--folder",
-                self.test_folder,
-                "--dict-name",
-                "test_dict",
-            ],
+            replace_text, _args(1, self.test_folder, dict_name="overlap_dict")
         )
         self.assertEqual(result.exit_code, 0)
 
-        with open(os.path.join(self.test_folder, "ignore_dir", "test.txt"), "r") as f:
+        with open(os.path.join(self.test_folder, "test1.txt"), "r") as f:
             content = f.read()
-        self.assertEqual(content, "Hello world")  # Content should remain unchanged
+        self.assertEqual(content, "2 1")
 
-    def test_ignore_file_prefixes(self):
-        with open(os.path.join(self.test_folder, "ignore_test.txt"), "w") as f:
-            f.write("Hello world")
+    def test_longest_key_wins_with_automaton(self):
+        Path(self.config_file).write_bytes(
+            _config_bytes(
+                (("overlap_dict", (("foo", "1"), ("foobar", "2"), ("barf", "3"))),)
+            )
+        )
+        Path(self.test_folder, "test1.txt").write_bytes(b"foobar foo barfoo" * 3)
+
+        # Use the automaton for any dictionary, scanning tiny windows so that
+        # matches run across them
+        with mock.patch("replace_text.replace_text.AUTOMATON_MIN_KEYS", 1), mock.patch(
+            "replace_text.replace_text.STREAM_CHUNK_SIZE", 4
+        ):
+            result = self.runner.invoke(
+                replace_text,
+                _args(1, self.test_folder, dict_name="overlap_dict", jobs=1),
+            )
+        self.assertEqual(result.exit_code, 0)
+
+        content = Path(self.test_folder, "test1.txt").read_text()
+        self.assertEqual(content, "2 1 3oo" * 3)
+
+    def test_unchanged_file_not_rewritten(self):
+        Path(self.config_file).write_bytes(
+            _config_bytes((("same_dict", (("Hello", "Hello"),)),))
+        )
+        file_path = os.path.join(self.test_folder, "test1.txt")
+        inode = os.stat(file_path).st_ino
+
+        # Paths are only resolved for files that change
+        with mock.patch("os.path.realpath") as realpath:
+            result = self.runner.invoke(
+                replace_text, _args(1, self.test_folder, dict_name="same_dict", jobs=1)
+            )
+        self.assertEqual(result.exit_code, 0)
+        self.assertEqual(os.stat(file_path).st_ino, inode)
+        realpath.assert_not_called()
+
+    def test_large_file(self):
+        Path(self.test_folder, "test1.txt").write_bytes(b"Hello world\n" * 10000)
 
         result = self.runner.invoke(
-            replace_text,
-            [
-                "--direction",
-                "1",
-                "--folder",
-                self.test_folder,
-                "--dict-name",
-                "test_dict",
-            ],
+            replace_text, _args(1, self.test_folder, dict_name="test_dict")
         )
         self.assertEqual(result.exit_code, 0)
 
-        with open(os.path.join(self.test_folder, "ignore_test.txt"), "r") as f:
+        with open(os.path.join(self.test_folder, "test1.txt"), "r") as f:
+            content = f.read()
+        self.assertEqual(content, "Bonjour monde\n" * 10000)
+
+    def test_streamed_file(self):
+        Path(self.test_folder, "test1.txt").write_bytes(b"Hello world\n" * 10000)
+
+        with mock.patch("replace_text.replace_text.STREAM_THRESHOLD", 0), mock.patch(
+            "replace_text.replace_text.STREAM_CHUNK_SIZE", 4096
+        ):
+            result = self.runner.invoke(
+                replace_text, _args(1, self.test_folder, dict_name="test_dict", jobs=1)
+            )
+        self.assertEqual(result.exit_code, 0)
+
+        with open(os.path.join(self.test_folder, "test1.txt"), "r") as f:
             content = f.read()
-        self.assertEqual(content, "Hello world")  # Content should remain unchanged
+        self.assertEqual(content, "Bonjour monde\n" * 10000)
 
 
 if __name__ == "__main__":